@@ -4,13 +4,89 @@ import signal
 import sys
 import ctypes
 import atexit
-from typing import List
+import functools
+import threading
+import time
+from typing import Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
 from enum import IntEnum, Flag, auto
 
 _logger = logging.getLogger("safe_exit")
 _registered = False
+_psutil = None
 _ctrl_handler = None
-_exit_funcs = []
+_exit_funcs: Dict[Hashable, List[Tuple[tuple, dict]]] = {}
+# Reentrant, so a signal arriving on the main thread while it holds the lock can't deadlock
+_exit_lock = threading.RLock()
+_already_called = False
+
+if os.name == 'nt':
+    from ctypes import wintypes
+
+    _HANDLER_ROUTINE = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.DWORD)
+    _ENUM_WINDOWS_PROC = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _user32 = ctypes.WinDLL('user32', use_last_error=True)
+
+    _AttachConsole = _kernel32.AttachConsole
+    _AttachConsole.argtypes = [wintypes.DWORD]
+    _AttachConsole.restype = wintypes.BOOL
+
+    _FreeConsole = _kernel32.FreeConsole
+    _FreeConsole.argtypes = []
+    _FreeConsole.restype = wintypes.BOOL
+
+    _AllocConsole = _kernel32.AllocConsole
+    _AllocConsole.argtypes = []
+    _AllocConsole.restype = wintypes.BOOL
+
+    _GetConsoleWindow = _kernel32.GetConsoleWindow
+    _GetConsoleWindow.argtypes = []
+    _GetConsoleWindow.restype = wintypes.HWND
+
+    _GenerateConsoleCtrlEvent = _kernel32.GenerateConsoleCtrlEvent
+    _GenerateConsoleCtrlEvent.argtypes = [wintypes.DWORD, wintypes.DWORD]
+    _GenerateConsoleCtrlEvent.restype = wintypes.BOOL
+
+    _SetConsoleCtrlHandler = _kernel32.SetConsoleCtrlHandler
+    _SetConsoleCtrlHandler.argtypes = [_HANDLER_ROUTINE, wintypes.BOOL]
+    _SetConsoleCtrlHandler.restype = wintypes.BOOL
+
+    _OpenProcess = _kernel32.OpenProcess
+    _OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    _OpenProcess.restype = wintypes.HANDLE
+
+    _WaitForSingleObject = _kernel32.WaitForSingleObject
+    _WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+    _WaitForSingleObject.restype = wintypes.DWORD
+
+    _WaitForMultipleObjects = _kernel32.WaitForMultipleObjects
+    _WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD]
+    _WaitForMultipleObjects.restype = wintypes.DWORD
+
+    _TerminateProcess = _kernel32.TerminateProcess
+    _TerminateProcess.argtypes = [wintypes.HANDLE, wintypes.UINT]
+    _TerminateProcess.restype = wintypes.BOOL
+
+    _CloseHandle = _kernel32.CloseHandle
+    _CloseHandle.argtypes = [wintypes.HANDLE]
+    _CloseHandle.restype = wintypes.BOOL
+
+    _EnumWindows = _user32.EnumWindows
+    _EnumWindows.argtypes = [_ENUM_WINDOWS_PROC, wintypes.LPARAM]
+    _EnumWindows.restype = wintypes.BOOL
+
+    _GetWindowThreadProcessId = _user32.GetWindowThreadProcessId
+    _GetWindowThreadProcessId.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]
+    _GetWindowThreadProcessId.restype = wintypes.DWORD
+
+    _PostMessageW = _user32.PostMessageW
+    _PostMessageW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+    _PostMessageW.restype = wintypes.BOOL
+
+    _ShowWindow = _user32.ShowWindow
+    _ShowWindow.argtypes = [wintypes.HWND, ctypes.c_int]
+    _ShowWindow.restype = wintypes.BOOL
 
 
 class ConfigFlag(Flag):
@@ -48,66 +124,152 @@ class WinCtrlEvent(IntEnum):
     CTRL_SHUTDOWN_EVENT = 6
 
 
+_SIGQUIT_BIT = ConfigFlag.SIGQUIT.value
+_SIGHUP_BIT = ConfigFlag.SIGHUP.value
+_SIGBREAK_BIT = ConfigFlag.SIGBREAK.value
+_CTRL_CLOSE_BIT = ConfigFlag.CTRL_CLOSE.value
+_CTRL_SHUTDOWN_BIT = ConfigFlag.CTRL_SHUTDOWN.value
+_CTRL_LOGOFF_BIT = ConfigFlag.CTRL_LOGOFF.value
+_AUTO_CREATE_CONSOLE_BIT = ConfigFlag.AUTO_CREATE_CONSOLE.value
+_FORCE_HIDE_CONSOLE_BIT = ConfigFlag.FORCE_HIDE_CONSOLE.value
+
+_POSIX_SIGMAP = [(_SIGQUIT_BIT, signal.SIGQUIT), (_SIGHUP_BIT, signal.SIGHUP)] if hasattr(signal, 'SIGQUIT') else []
+_NT_SIGMAP = [(_SIGBREAK_BIT, signal.SIGBREAK)] if hasattr(signal, 'SIGBREAK') else []
+_CTRL_EVENTMAP = [
+    (_CTRL_CLOSE_BIT, WinCtrlEvent.CTRL_CLOSE_EVENT.value),
+    (_CTRL_LOGOFF_BIT, WinCtrlEvent.CTRL_LOGOFF_EVENT.value),
+    (_CTRL_SHUTDOWN_BIT, WinCtrlEvent.CTRL_SHUTDOWN_EVENT.value),
+]
+
+
 class SafeExitException(Exception):
-    pass
+    """Raised when a process can't be killed gracefully.
 
+    Windows error codes and nested errors are kept as they are and only formatted by ``str()``,
+    so callers that swallow the exception don't pay for FormatMessageW.
+    """
 
-@atexit.register
-def _call_exit_funcs():
-    global _exit_funcs
+    def __init__(self, message: Optional[str] = None, win_error: Optional[int] = None,
+                 errors: Sequence[Exception] = ()):
+        # args holds the message, or the nested errors when there is no message of its own
+        if message is not None:
+            super().__init__(message)
+        else:
+            super().__init__(*errors)
+        self.message = message
+        self.win_error = win_error
+        self.errors = list(errors)
 
-    for (func, args, kwargs) in _exit_funcs:
-        try:
-            func(*args, **kwargs)
-        except Exception as e:
-            _logger.exception(f"exit function {func} error: {e}")
+    def __str__(self):
+        if self.errors:
+            return ' and '.join(str(e) for e in self.errors)
+        if self.message is None:
+            return ''
+        if self.win_error is not None:
+            return f"{self.message}: {ctypes.WinError(self.win_error)}"
+        return self.message
 
-    _exit_funcs = []
+    def __repr__(self):
+        return f"{type(self).__name__}({str(self)!r})"
 
 
-def _register_ctrl_handler(events: List[int]):
-    from ctypes import wintypes
+class _UnhashableKey:
+    # Registry key for callables that can't be hashed (e.g. defining __eq__ without __hash__).
+    # All of them share one hash, so the dict falls back to comparing them with ==.
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __hash__(self):
+        return 0
+
+    def __eq__(self, other):
+        return isinstance(other, _UnhashableKey) and self.func == other.func
+
+
+def _exit_key(func):
+    try:
+        hash(func)
+    except TypeError:
+        return _UnhashableKey(func)
+    return func
+
+
+@atexit.register
+def _call_exit_funcs():
+    global _exit_funcs, _already_called
 
+    # Exit functions may be triggered from the ctrl handler thread and the signal handler at the same time,
+    # only the first caller runs them.
+    with _exit_lock:
+        if _already_called:
+            return
+        _already_called = True
+
+    # Take a snapshot so each function runs at most once and callbacks can safely (un)register;
+    # functions registered by a callback land in the fresh dict and are run by the next round.
+    while True:
+        with _exit_lock:
+            snapshot = _exit_funcs
+            _exit_funcs = {}
+        if not snapshot:
+            break
+
+        for key, calls in snapshot.items():
+            func = key.func if isinstance(key, _UnhashableKey) else key
+            for (args, kwargs) in calls:
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:
+                    _logger.exception(f"exit function {func} error: {e}")
+
+
+def _register_ctrl_handler(events: FrozenSet[int]):
     global _ctrl_handler
 
-    _HandlerRoutine = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.DWORD)
+    log_info = _logger.info
+    call_exit_funcs = _call_exit_funcs
 
     def ctrl_handler(ctrl_type):
-        if ctrl_type in events:
-            _logger.info(f"Ctrl handler received {ctrl_type}. Performing graceful shutdown...")
-            _call_exit_funcs()
-            return True
+        # CTRL_C_EVENT and CTRL_BREAK_EVENT are left to Python's own handler, bail out before any other work
+        if ctrl_type not in events:
+            return False
 
-        return False
+        log_info("Ctrl handler received %s. Performing graceful shutdown...", ctrl_type)
+        call_exit_funcs()
+        return True
 
-    _ctrl_handler = _HandlerRoutine(ctrl_handler)
-    kernel32 = ctypes.windll.kernel32
-    if not kernel32.SetConsoleCtrlHandler(_ctrl_handler, True):
+    # Keep a reference so the trampoline outlives this call
+    _ctrl_handler = _HANDLER_ROUTINE(ctrl_handler)
+    if not _SetConsoleCtrlHandler(_ctrl_handler, True):
         raise ctypes.WinError(ctypes.get_last_error())
 
 
-def _signal_handler(sig, frame):
-    _logger.info(f"Receive {sig}, Performing graceful shutdown...")
-    _call_exit_funcs()
-    sys.exit(0)
+def _signal_handler(sig, frame, _log=_logger.info, _call=_call_exit_funcs, _exit=sys.exit):
+    # Python handlers run on the main thread between bytecodes, not in the C signal context;
+    # keep them cheap by deferring log formatting until a handler actually emits the record,
+    # and by binding the globals they use as defaults.
+    _log("Receive %s, Performing graceful shutdown...", sig)
+    _call()
+    _exit(0)
 
 
 def _register_signals(flag: ConfigFlag):
-    # Register the signal handler
+    # Register the signal handler.
+    # signal.signal is used instead of blocking the signals and reading them from a signalfd:
+    # a blocked mask is inherited by child processes across exec, so they would ignore SIGTERM/SIGINT,
+    # and it would bypass Python's own SIGINT handling (KeyboardInterrupt).
     signal.signal(signal.SIGINT, _signal_handler)
     signal.signal(signal.SIGTERM, _signal_handler)
+    flag_int = flag.value
     if os.name == 'posix':
-        if ConfigFlag.SIGQUIT in flag: signal.signal(signal.SIGQUIT, _signal_handler)
-        if ConfigFlag.SIGHUP in flag: signal.signal(signal.SIGHUP, _signal_handler)
+        for bit, sig in _POSIX_SIGMAP:
+            if flag_int & bit: signal.signal(sig, _signal_handler)
     if os.name == 'nt':
-        if ConfigFlag.SIGBREAK in flag: signal.signal(signal.SIGBREAK, _signal_handler)
-        events = []
-        if ConfigFlag.CTRL_CLOSE in flag:
-            events.append(WinCtrlEvent.CTRL_CLOSE_EVENT.value)
-        if ConfigFlag.CTRL_LOGOFF in flag:
-            events.append(WinCtrlEvent.CTRL_LOGOFF_EVENT.value)
-        if ConfigFlag.CTRL_SHUTDOWN in flag:
-            events.append(WinCtrlEvent.CTRL_SHUTDOWN_EVENT.value)
+        for bit, sig in _NT_SIGMAP:
+            if flag_int & bit: signal.signal(sig, _signal_handler)
+        events = frozenset(event for bit, event in _CTRL_EVENTMAP if flag_int & bit)
         if len(events) > 0:
             _register_ctrl_handler(events)
 
@@ -116,45 +278,42 @@ def _register_signals(flag: ConfigFlag):
 
 
 def _win_console_event_kill(pid, kill_signal: int):
-    kernel32 = ctypes.windll.kernel32
-
-    if kernel32.AttachConsole(pid):
+    if _AttachConsole(pid):
         # Send the CTRL_C_EVENT signal
-        success = kernel32.GenerateConsoleCtrlEvent(kill_signal, 0)
+        success = _GenerateConsoleCtrlEvent(kill_signal, 0)
+        error = ctypes.get_last_error()
         # Detach from the target process console
-        kernel32.FreeConsole()
+        _FreeConsole()
         if not success:
-            error = ctypes.WinError(kernel32.GetLastError())
-            raise SafeExitException(f"Failed to send CTRL EVENT {kill_signal} to process {pid}: {error}")
+            raise SafeExitException(f"Failed to send CTRL EVENT {kill_signal} to process {pid}", error)
     else:
-        error = ctypes.WinError(kernel32.GetLastError())
-        raise SafeExitException(f"Can't attach console for process {pid}: {error}")
+        raise SafeExitException(f"Can't attach console for process {pid}", ctypes.get_last_error())
 
 
 def _win_send_wm_close(pid):
-    from ctypes import wintypes
-
-    EnumWindowsProc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
-
     def find_main_window(pid):
+        # Bound once here and reused by the callback, which runs for every enumerated window
+        get_window_thread_process_id = _GetWindowThreadProcessId
+        window_pid = wintypes.DWORD()
+        window_pid_ref = ctypes.byref(window_pid)
+
         def enum_windows_callback(hwnd, lParam):
-            window_pid = ctypes.wintypes.DWORD()
-            ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.pointer(window_pid))
+            get_window_thread_process_id(hwnd, window_pid_ref)
             if window_pid.value == lParam:
                 found_windows.append(hwnd)
                 return False  # Stop enumerating windows
             return True  # Continue enumerating windows
 
         found_windows = []
-        ctypes.windll.user32.EnumWindows(EnumWindowsProc(enum_windows_callback), pid)
+        # Held for the whole enumeration so the trampoline can't be collected between calls
+        callback = _ENUM_WINDOWS_PROC(enum_windows_callback)
+        _EnumWindows(callback, pid)
 
         return found_windows[0] if found_windows else None
 
     def send_wm_close(hwnd):
         WM_CLOSE = 0x0010
-        ctypes.windll.user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
-
-    kernel32 = ctypes.windll.kernel32
+        _PostMessageW(hwnd, WM_CLOSE, 0, 0)
 
     hwnd = find_main_window(pid)
     if hwnd:
@@ -164,23 +323,132 @@ def _win_send_wm_close(pid):
 
 
 def _win_nice_kill(pid, kill_signal: int = None):
-    error_msg = []
-
+    strategies = []
     if kill_signal is None or kill_signal > WinCtrlEvent.CTRL_BREAK_EVENT:
+        strategies.append((_win_send_wm_close, (pid,)))
+    if kill_signal is None or kill_signal in (WinCtrlEvent.CTRL_C_EVENT, WinCtrlEvent.CTRL_BREAK_EVENT):
+        strategies.append((_win_console_event_kill,
+                           (pid, WinCtrlEvent.CTRL_C_EVENT if kill_signal is None else kill_signal)))
+
+    errors = []
+    for (strategy, args) in strategies:
         try:
-            _win_send_wm_close(pid)
-            return
+            return strategy(*args)
         except Exception as e:
-            error_msg.append(str(e))
+            errors.append(e)
 
-    if kill_signal is None or kill_signal in (WinCtrlEvent.CTRL_C_EVENT, WinCtrlEvent.CTRL_BREAK_EVENT):
+    raise SafeExitException(errors=errors) from (errors[0] if errors else None)
+
+
+def _get_psutil():
+    global _psutil
+
+    if _psutil is None:
+        import psutil
+        _psutil = psutil
+    return _psutil
+
+
+def _posix_is_alive(pid):
+    # Reap the process first if it is our child, otherwise a zombie still answers kill(pid, 0)
+    try:
+        wait_pid, _ = os.waitpid(pid, os.WNOHANG)
+        return wait_pid == 0
+    except ChildProcessError:
+        pass
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _posix_kill_many(pids, kill_signal, timeout_secs, force_kill):
+    errors = []
+    running = []
+    for pid in pids:
         try:
-            _win_console_event_kill(pid, WinCtrlEvent.CTRL_C_EVENT if kill_signal is None else kill_signal)
-            return
+            os.kill(pid, kill_signal if kill_signal is not None else signal.SIGTERM)
+            running.append(pid)
         except Exception as e:
-            error_msg.append(str(e))
+            errors.append(SafeExitException(f"Can't send signal to process {pid}: {e}"))
+
+    deadline = time.monotonic() + timeout_secs
+    interval = 0.01
+    while running:
+        running = [pid for pid in running if _posix_is_alive(pid)]
+        remaining = deadline - time.monotonic()
+        if running and remaining <= 0:
+            errors.append(SafeExitException(f"Processes {running} still alive after {timeout_secs} seconds"))
+            break
+        if running:
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, 0.25)
+
+    if force_kill:
+        for pid in pids:
+            if not _posix_is_alive(pid):
+                continue
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            except Exception as e:
+                errors.append(SafeExitException(f"Can't kill process {pid}: {e}"))
+
+    return errors
+
+
+def _win_wait_many(handles, timeout_secs):
+    MAXIMUM_WAIT_OBJECTS = 64
+
+    deadline = time.monotonic() + timeout_secs
+    for start in range(0, len(handles), MAXIMUM_WAIT_OBJECTS):
+        batch = handles[start:start + MAXIMUM_WAIT_OBJECTS]
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        _WaitForMultipleObjects(len(batch), (wintypes.HANDLE * len(batch))(*batch), True, remaining_ms)
+
+
+def _win_kill_many(pids, kill_signal, timeout_secs, force_kill):
+    PROCESS_TERMINATE = 0x0001
+    SYNCHRONIZE = 0x00100000
+    WAIT_OBJECT_0 = 0
+
+    errors = []
+    handles = {}
+    signaled = []
+    try:
+        for pid in pids:
+            # Open the handle before signaling, so a reused pid can't be waited on or killed by mistake
+            handle = _OpenProcess(SYNCHRONIZE | PROCESS_TERMINATE, False, pid)
+            if not handle:
+                errors.append(SafeExitException(f"Can't open process {pid}", ctypes.get_last_error()))
+                continue
+            handles[pid] = handle
+            try:
+                _win_nice_kill(pid, kill_signal)
+                signaled.append(pid)
+            except Exception as e:
+                errors.append(e)
+
+        _win_wait_many([handles[pid] for pid in signaled], timeout_secs)
+
+        running = [pid for pid, handle in handles.items() if _WaitForSingleObject(handle, 0) != WAIT_OBJECT_0]
+        timed_out = [pid for pid in running if pid in signaled]
+        if timed_out:
+            errors.append(SafeExitException(f"Processes {timed_out} still alive after {timeout_secs} seconds"))
+        if force_kill:
+            for pid in running:
+                if not _TerminateProcess(handles[pid], signal.SIGTERM):
+                    errors.append(SafeExitException(f"Can't terminate process {pid}", ctypes.get_last_error()))
+    finally:
+        for handle in handles.values():
+            _CloseHandle(handle)
 
-    raise SafeExitException(' and '.join(error_msg))
+    return errors
 
 
 def config(flag: ConfigFlag = DEFAULT_CONFIG):
@@ -207,19 +475,17 @@ def config(flag: ConfigFlag = DEFAULT_CONFIG):
     :type flag: ConfigFlag
     """
     if os.name == 'nt':
-        user32 = ctypes.windll.user32
-        kernel32 = ctypes.windll.kernel32
-
-        hwnd = kernel32.GetConsoleWindow()
-        if hwnd and ConfigFlag.FORCE_HIDE_CONSOLE in flag:
-            user32.ShowWindow(hwnd, 0)
-        if not hwnd and ConfigFlag.AUTO_CREATE_CONSOLE in flag:
-            kernel32.AllocConsole()
+        hwnd = _GetConsoleWindow()
+        flag_int = flag.value
+        if hwnd and flag_int & _FORCE_HIDE_CONSOLE_BIT:
+            _ShowWindow(hwnd, 0)
+        if not hwnd and flag_int & _AUTO_CREATE_CONSOLE_BIT:
+            _AllocConsole()
             sys.stdin = open("CONIN$", "r")
             sys.stdout = open("CONOUT$", "w")
             sys.stderr = open("CONOUT$", "w")
-            hwnd = kernel32.GetConsoleWindow()
-            user32.ShowWindow(hwnd, 0)
+            hwnd = _GetConsoleWindow()
+            _ShowWindow(hwnd, 0)
 
     _register_signals(flag)
 
@@ -230,21 +496,35 @@ def register(func, *args, **kwargs):
     Any optional arguments that are to be passed to func must be passed as arguments to register().
 
     This function can be used as function decorator.
+
+    A function registered more than once is called once per registration,
+    all calls grouped at the position of its first registration.
     """
     if not _registered:
         config(DEFAULT_CONFIG)
-    _exit_funcs.append((func, args, kwargs))
+    # Signals are configured from now on, later calls through the module can skip the check
+    globals()['register'] = _register_fast
+    _exit_funcs.setdefault(_exit_key(func), []).append((args, kwargs))
+    return func
+
+
+def _register_fast(func, *args, **kwargs):
+    _exit_funcs.setdefault(_exit_key(func), []).append((args, kwargs))
     return func
 
 
+functools.update_wrapper(_register_fast, register)
+
+
 def unregister(func):
-    """Remove func from the list of functions to be run at interpreter shutdown."""
-    idx = 0
-    while idx < len(_exit_funcs):
-        if _exit_funcs[idx][0] == func:
-            _exit_funcs.pop(idx)
-        else:
-            idx += 1
+    """Remove func from the list of functions to be run at interpreter shutdown.
+
+    Functions are looked up like dict keys, by hash and equality.
+    A bound method can be removed with a fresh ``obj.method``,
+    but a lambda must be the same object that was registered.
+    Callables that can't be hashed are compared with ``==``.
+    """
+    _exit_funcs.pop(_exit_key(func), None)
 
 
 def safe_kill(pid, kill_signal=None, timeout_secs=4, force_kill=True, silence=True):
@@ -265,27 +545,82 @@ def safe_kill(pid, kill_signal=None, timeout_secs=4, force_kill=True, silence=Tr
     :param silence: If True, raise no exception if sending the signal results in an error.
     :type silence: bool
 
+    :raises SafeExitException: If silence is False and the process doesn't exist,
+        can't be signaled, is still alive after timeout_secs or can't be force killed.
+
     This function first try to send kill_signal to the process,
     and wait for timeout_secs, if the process still alive, it then forces kill it.
 
+    On POSIX, this function only uses ``os.kill``; psutil is needed on windows only.
+
     On windows, this function tries to find a window for the process, if found, it sends the WM_CLOSE event.
     If no window is found, it tries to find console for the process.
     If a console is found, it tries to attach the console and sends the CTRL_C_EVENT to the process.
     """
-    import psutil
-
-    proc = psutil.Process(pid)
+    if os.name == 'posix':
+        errors = _posix_kill_many([pid], kill_signal, timeout_secs, force_kill)
+        if errors and not silence:
+            raise SafeExitException(errors=errors) from errors[0]
+        return
 
+    psutil = _get_psutil()
     try:
-        if os.name == 'posix':
-            os.kill(pid, kill_signal if kill_signal is not None else signal.SIGTERM)
-        if os.name == 'nt':
-            _win_nice_kill(pid, kill_signal)
+        proc = psutil.Process(pid)
+    except psutil.Error as e:
+        if not silence:
+            raise SafeExitException(f"Can't find process {pid}: {e}") from e
+        return
 
+    try:
+        _win_nice_kill(pid, kill_signal)
         proc.wait(timeout_secs)
+    except SafeExitException:
+        if not silence:
+            raise
+    except psutil.TimeoutExpired as e:
+        if not silence:
+            raise SafeExitException(f"Process {pid} still alive after {timeout_secs} seconds") from e
     except Exception as e:
         if not silence:
-            raise e
+            raise SafeExitException(f"Can't kill process {pid}: {e}") from e
     finally:
         if force_kill and proc.is_running():
-            proc.kill()
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+            except psutil.Error as e:
+                if not silence:
+                    raise SafeExitException(f"Can't kill process {pid}: {e}") from e
+
+
+def safe_kill_many(pids, kill_signal=None, timeout_secs=4, force_kill=True, silence=True):
+    """Gracefully kills several processes at once.
+
+    :param pids: Process ids to be killed.
+    :type pids: Iterable[int]
+
+    :param kill_signal: Which signal to send; can be None to use default signal
+    :type kill_signal: int
+
+    :param timeout_secs: How many seconds to wait for all processes to terminate.
+    :type timeout_secs: int
+
+    :param force_kill: If True, force kill the processes still alive after timeout.
+    :type force_kill: bool
+
+    :param silence: If True, raise no exception if sending the signal results in an error.
+    :type silence: bool
+
+    This function works like :func:`safe_kill`, but it first sends kill_signal to every process,
+    then waits for all of them together, so the total waiting time is timeout_secs instead of
+    timeout_secs for each process.
+    """
+    pids = list(pids)
+    if os.name == 'posix':
+        errors = _posix_kill_many(pids, kill_signal, timeout_secs, force_kill)
+    else:
+        errors = _win_kill_many(pids, kill_signal, timeout_secs, force_kill)
+
+    if errors and not silence:
+        raise SafeExitException(errors=errors) from errors[0]
@@ -1,9 +1,11 @@
+import logging
 import os
 import re
 import signal
 import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
@@ -14,37 +16,145 @@ if os.name != "posix":
     pytest.skip(f"skipping posix tests on {sys.platform}", allow_module_level=True)
 
 
-@pytest.mark.parametrize("signal_to_send", [signal.SIGINT, signal.SIGTERM, signal.SIGQUIT, signal.SIGHUP])
-def test_signal(signal_to_send):
-    # create process
-    process = subprocess.Popen([sys.executable, __file__], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    time.sleep(1)
+def wait_ready(process):
+    # the child writes one byte once its exit functions are registered
+    assert process.stdout.read(1) == b'R'
 
-    # safe_kill process with signal
-    safe_exit.safe_kill(process.pid, signal_to_send)
 
-    # check process output match "safe_exit on signal %d"
-    output, _ = process.communicate()
-    expect = f"process {process.pid} safe_exit"
-    actual = output.decode('utf-8')
-    assert len(re.findall(expect, actual)) == 1
+def test_signal():
+    # create one process for each signal, so their lifecycles overlap instead of running one by one
+    # stdout only carries the readiness byte, the exit function writes to a log file
+    signals = [signal.SIGINT, signal.SIGTERM, signal.SIGQUIT, signal.SIGHUP]
+    processes = [(subprocess.Popen([sys.executable, __file__, 'log_file'], stdout=subprocess.PIPE), sig)
+                 for sig in signals]
+    for process, _ in processes:
+        wait_ready(process)
+
+    # safe_kill processes with signal
+    with ThreadPoolExecutor(max_workers=len(processes)) as executor:
+        list(executor.map(lambda item: safe_exit.safe_kill(item[0].pid, item[1]), processes))
+
+    # check process log match "process %d safe_exit"
+    for process, sig in processes:
+        process.wait(timeout=20)
+        process.stdout.close()
+        log_file_name = f"{process.pid}.log"
+        with open(log_file_name, "rb") as f:
+            assert f.read().count(f"process {process.pid} safe_exit".encode()) == 1, f"{sig!r} not handled"
+        os.unlink(log_file_name)
+
+
+def test_safe_kill_many():
+    # create processes
+    processes = [subprocess.Popen([sys.executable, __file__], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                 for _ in range(3)]
+    for process in processes:
+        wait_ready(process)
+
+    # safe_kill all processes together
+    safe_exit.safe_kill_many([process.pid for process in processes], signal.SIGTERM, silence=False)
+
+    for process in processes:
+        output, _ = process.communicate()
+        assert len(re.findall(f"process {process.pid} safe_exit", output.decode('utf-8'))) == 1
+
+
+def test_safe_kill_missing_process():
+    # a finished and reaped child, its pid no longer exists
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+
+    safe_exit.safe_kill(process.pid)
+    with pytest.raises(safe_exit.SafeExitException) as exc_info:
+        safe_exit.safe_kill(process.pid, silence=False)
+    assert str(process.pid) in str(exc_info.value)
+    assert str(process.pid) in repr(exc_info.value)
+
+
+INVALID_PID_SCRIPT = """
+import sys, safe_exit
+pid = int(sys.argv[1])
+safe_exit.safe_kill(pid)
+try:
+    safe_exit.safe_kill(pid, silence=False)
+except safe_exit.SafeExitException:
+    print("rejected")
+"""
+
+
+@pytest.mark.parametrize("pid", [0, -1])
+def test_safe_kill_invalid_pid(pid):
+    # 0 and negative pids address process groups, they must not be signaled.
+    # Run in a new session, so a regression only hits the child's own group.
+    process = subprocess.run([sys.executable, '-c', INVALID_PID_SCRIPT, str(pid)],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True, timeout=20)
+    assert process.returncode == 0
+    assert process.stdout.decode('utf-8').strip() == "rejected"
 
 
 def test_sys_exit():
     # create process
     process = subprocess.Popen([sys.executable, __file__, 'sys_exit'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    time.sleep(1)
 
     # check process output match "safe_exit on signal %d"
     output, _ = process.communicate()
     assert len(re.findall(f"process {process.pid} safe_exit", output.decode('utf-8'))) == 1
 
 
+def test_register_after_first_call():
+    # create process
+    process = subprocess.Popen([sys.executable, __file__, 'register_twice'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # check register keeps its name and still records functions after the first call
+    output, _ = process.communicate()
+    actual = output.decode('utf-8')
+    assert "register name: register register safe_exit" in actual
+    assert len(re.findall(f"process {process.pid} safe_exit", actual)) == 2
+
+
+def test_unhashable_callable():
+    # create process
+    process = subprocess.Popen([sys.executable, __file__, 'unhashable'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # check the unhashable callable left registered runs, and the unregistered one doesn't
+    output, _ = process.communicate()
+    assert len(re.findall(f"process {process.pid} safe_exit", output.decode('utf-8'))) == 1
+
+
+def test_unregister():
+    # create process
+    process = subprocess.Popen([sys.executable, __file__, 'unregister'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # check process exits without calling the unregistered function
+    output, _ = process.communicate()
+    assert len(output) == 0
+
+
+def test_unregister_during_exit():
+    # create process
+    process = subprocess.Popen([sys.executable, __file__, 'unregister_during_exit'],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # check the function still runs exactly once although it was unregistered by another exit function
+    output, _ = process.communicate()
+    assert len(re.findall(f"process {process.pid} safe_exit", output.decode('utf-8'))) == 1
+
+
+def test_register_during_exit():
+    # create process
+    process = subprocess.Popen([sys.executable, __file__, 'register_during_exit'],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # check a function registered by another exit function still runs, exactly once
+    output, _ = process.communicate()
+    assert len(re.findall(f"process {process.pid} safe_exit", output.decode('utf-8'))) == 1
+
+
 @pytest.mark.parametrize("signal_to_send", [signal.SIGQUIT, signal.SIGHUP])
 def test_no_handle_signal(signal_to_send):
     # create process
     process = subprocess.Popen([sys.executable, __file__, 'no_extra_signal'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    time.sleep(1)
+    wait_ready(process)
 
     # safe_kill process with signal
     safe_exit.safe_kill(process.pid, signal_to_send)
@@ -58,14 +168,66 @@ if __name__ == "__main__":
     if len(sys.argv) == 2 and sys.argv[1] == 'no_extra_signal':
         safe_exit.config(safe_exit.ConfigFlag(0))
 
-    def clean_func():
-        print(f"process {os.getpid()} safe_exit")
+    if len(sys.argv) == 2 and sys.argv[1] == 'log_file':
+        logging.basicConfig(filename=f"{os.getpid()}.log", level=logging.INFO)
+
+        def clean_func():
+            logging.info(f"process {os.getpid()} safe_exit")
+    else:
+        def clean_func():
+            print(f"process {os.getpid()} safe_exit")
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'unregister_during_exit':
+        safe_exit.register(safe_exit.unregister, clean_func)
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'register_during_exit':
+        safe_exit.register(safe_exit.register, clean_func)
+        sys.exit(0)
 
     safe_exit.register(clean_func)
 
-    if len(sys.argv) == 2 and sys.argv[1] == 'sys_exit':
+    if len(sys.argv) == 2 and sys.argv[1] in ('sys_exit', 'unregister_during_exit'):
+        sys.exit(0)
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'register_twice':
+        register = safe_exit.register
+        print(f"register name: {register.__name__} {register.__qualname__} {register.__module__}")
+        register(clean_func)
+        sys.exit(0)
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'unhashable':
+        class UnhashableCleaner:
+            # defines __eq__ without __hash__, so instances can't be hashed
+            def __init__(self, name):
+                self.name = name
+
+            def __eq__(self, other):
+                return self.name == other.name
+
+            def __call__(self):
+                clean_func()
+
+        safe_exit.unregister(clean_func)
+        safe_exit.register(UnhashableCleaner('kept'))
+        safe_exit.register(UnhashableCleaner('removed'))
+        safe_exit.unregister(UnhashableCleaner('removed'))
         sys.exit(0)
 
+    if len(sys.argv) == 2 and sys.argv[1] == 'unregister':
+        class Cleaner:
+            def clean(self):
+                clean_func()
+
+        cleaner = Cleaner()
+        safe_exit.register(clean_func)
+        safe_exit.register(cleaner.clean)
+        safe_exit.unregister(clean_func)
+        safe_exit.unregister(cleaner.clean)
+        sys.exit(0)
+
+    sys.stdout.buffer.write(b'R')
+    sys.stdout.buffer.flush()
+
     try:
         while True:
             time.sleep(1)
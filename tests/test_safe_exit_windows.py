@@ -1,7 +1,6 @@
-import ctypes
 import logging
+import mmap
 import os
-import re
 import subprocess
 import sys
 import time
@@ -15,15 +14,70 @@ if os.name != "nt":
     pytest.skip(f"skipping posix tests on {sys.platform}", allow_module_level=True)
 
 
-def check_log_ready(pid):
+def check_log_ready(process, timeout=15):
+    # returns the opened log fd, so the test can check the log later without opening it again
+    pid = process.pid
     log_file_name = f"{pid}.log"
-    while True:
-        time.sleep(1)
-        if not os.path.exists(log_file_name):
-            continue
-        with open(log_file_name, 'r') as f:
-            if f"{pid} ready" in f.read():
-                return True
+    deadline = time.monotonic() + timeout
+    # poll quickly at first, the child is usually ready within a few hundred milliseconds
+    interval = 0.02
+    fd = None
+    logs = b""
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"process {pid} exited with {process.returncode} before ready")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"process {pid} not ready after {timeout} seconds")
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.6, 1)
+            if fd is None:
+                if not os.path.exists(log_file_name):
+                    continue
+                fd = os.open(log_file_name, os.O_RDONLY | os.O_BINARY)
+            # only read what the child wrote since the last poll
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                logs += chunk
+            if f"{pid} ready".encode() in logs:
+                return fd
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        raise
+
+
+# The sender of a console ctrl event receives it too, so the kill is done from a detached helper process.
+# The helper only imports safe_exit, not pytest and this test module, to keep its startup short.
+KILLER_SCRIPT = "import sys, safe_exit; safe_exit.safe_kill(int(sys.argv[1]), int(sys.argv[2]), silence=False)"
+KILL_MANY_SCRIPT = ("import sys, safe_exit; "
+                    "safe_exit.safe_kill_many([int(pid) for pid in sys.argv[2:]], int(sys.argv[1]), silence=False)")
+
+
+def run_helper(script, *args):
+    run_result = subprocess.run(
+        [sys.executable, '-c', script, *[str(arg) for arg in args]],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=subprocess.DETACHED_PROCESS)
+    if run_result.returncode != 0:
+        logging.error(f"kill process error: {run_result.stdout} \n\n {run_result.stderr}")
+
+
+def run_killer(pid, kill_signal):
+    run_helper(KILLER_SCRIPT, pid, kill_signal)
+
+
+def count_in_log(fd, text):
+    needle = text.encode()
+    count = 0
+    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+        pos = mm.find(needle)
+        while pos != -1:
+            count += 1
+            pos = mm.find(needle, pos + 1)
+    return count
 
 
 @pytest.mark.parametrize("signal_to_send",
@@ -31,84 +85,72 @@ def check_log_ready(pid):
 def test_console_signal(signal_to_send):
     # create process
     process = subprocess.Popen([sys.executable, __file__], creationflags=subprocess.CREATE_NEW_CONSOLE)
-    check_log_ready(process.pid)
+    log_fd = check_log_ready(process)
 
     # safe_kill process with signal
-    run_result = subprocess.run(
-        [sys.executable, __file__, 'kill', str(process.pid), str(signal_to_send)],
-        creationflags=subprocess.DETACHED_PROCESS)
-    if run_result.returncode != 0:
-        logging.error(f"kill process error: {run_result.stdout} \n\n {run_result.stderr}")
+    run_killer(process.pid, signal_to_send)
 
     process.wait(timeout=20)
 
-    log_file_name = f"{process.pid}.log"
-    with open(log_file_name, "r") as f:
-        logs = f.read()
-        assert len(re.findall(f"process {process.pid} safe_exit", logs)) == 1
+    assert count_in_log(log_fd, f"process {process.pid} safe_exit") == 1
 
-    os.unlink(log_file_name)
+    os.close(log_fd)
+    os.unlink(f"{process.pid}.log")
 
 
 def test_wm_close():
     # create process
     process = subprocess.Popen([sys.executable, __file__, 'auto_create'], creationflags=subprocess.DETACHED_PROCESS)
-    check_log_ready(process.pid)
+    log_fd = check_log_ready(process)
 
     # safe_kill process with signal
-    run_result = subprocess.run(
-        [sys.executable, __file__, 'kill', str(process.pid), str(safe_exit.WinCtrlEvent.CTRL_CLOSE_EVENT.value)],
-        creationflags=subprocess.DETACHED_PROCESS)
-    if run_result.returncode != 0:
-        logging.error(f"kill process error: {run_result.stdout} \n\n {run_result.stderr}")
+    run_killer(process.pid, safe_exit.WinCtrlEvent.CTRL_CLOSE_EVENT.value)
 
     process.wait(timeout=20)
 
-    log_file_name = f"{process.pid}.log"
-    with open(log_file_name, "r") as f:
-        logs = f.read()
-        assert len(re.findall(f"process {process.pid} safe_exit", logs)) == 1
+    assert count_in_log(log_fd, f"process {process.pid} safe_exit") == 1
+
+    os.close(log_fd)
+    os.unlink(f"{process.pid}.log")
+
+
+def test_safe_kill_many():
+    # create processes
+    processes = [subprocess.Popen([sys.executable, __file__, 'auto_create'], creationflags=subprocess.DETACHED_PROCESS)
+                 for _ in range(3)]
+    log_fds = [check_log_ready(process) for process in processes]
+
+    # safe_kill all processes together
+    run_helper(KILL_MANY_SCRIPT, safe_exit.WinCtrlEvent.CTRL_CLOSE_EVENT.value, *[process.pid for process in processes])
 
-    os.unlink(log_file_name)
+    for process, log_fd in zip(processes, log_fds):
+        process.wait(timeout=20)
+
+        assert count_in_log(log_fd, f"process {process.pid} safe_exit") == 1
+
+        os.close(log_fd)
+        os.unlink(f"{process.pid}.log")
 
 
 def test_no_handle_signal():
     # create process
     process = subprocess.Popen([sys.executable, __file__, 'no_signal'], creationflags=subprocess.DETACHED_PROCESS)
-    check_log_ready(process.pid)
+    log_fd = check_log_ready(process)
 
     # safe_kill process with signal
-    run_result = subprocess.run(
-        [sys.executable, __file__, 'kill', str(process.pid), str(safe_exit.WinCtrlEvent.CTRL_CLOSE_EVENT.value)],
-        creationflags=subprocess.DETACHED_PROCESS)
-    if run_result.returncode != 0:
-        logging.error("kill process error")
+    run_killer(process.pid, safe_exit.WinCtrlEvent.CTRL_CLOSE_EVENT.value)
 
     process.wait(timeout=20)
 
-    log_file_name = f"{process.pid}.log"
-    with open(log_file_name, "r") as f:
-        logs = f.read()
-        assert f"process {process.pid} safe_exit" not in logs
+    assert count_in_log(log_fd, f"process {process.pid} safe_exit") == 0
 
-    os.unlink(log_file_name)
+    os.close(log_fd)
+    os.unlink(f"{process.pid}.log")
 
 
 if __name__ == "__main__":
     logging.basicConfig(filename=f"{os.getpid()}.log", level=logging.DEBUG)
 
-    if len(sys.argv) == 4 and sys.argv[1] == 'kill':
-        try:
-            kernel32 = ctypes.windll.kernel32
-            hwnd = kernel32.GetConsoleWindow()
-            print(f"killer's console window is {hwnd}")
-            safe_exit.safe_kill(int(sys.argv[2]), int(sys.argv[3]), silence=False)
-        except Exception as e:
-            logging.exception(f"kill process {sys.argv[2]} error: {e}")
-            exit(1)
-        exit(0)
-
-
     def clean_func():
         logging.info(f"process {os.getpid()} safe_exit")
 